@@ -21,6 +21,8 @@ class FlutterwaveRateService {
   static const bool _useBackend = true;
   
   WebSocketChannel? _channel;
+  // Position in the server's rate event log, sent on reconnect to only get missed updates
+  String? _lastSeq;
   Function(Map<String, ExchangeRate>)? onAllRatesReceived;
   Function(String, ExchangeRate)? onRateUpdate;
 
@@ -133,8 +135,9 @@ class FlutterwaveRateService {
     if (_channel != null) return; // Already connected
     
     try {
+      final resume = _lastSeq == null ? '' : '?last_seq=${Uri.encodeQueryComponent(_lastSeq!)}';
       _channel = WebSocketChannel.connect(
-        Uri.parse('$_backendWsUrl/ws/rates/'),
+        Uri.parse('$_backendWsUrl/ws/rates/$resume'),
       );
       
       _channel!.stream.listen(
@@ -142,6 +145,10 @@ class FlutterwaveRateService {
           try {
             final data = jsonDecode(message) as Map<String, dynamic>;
             final type = data['type'] as String?;
+            final seq = data['seq'] as String?;
+            if (seq != null) {
+              _lastSeq = seq;
+            }
             
             if (type == 'all_rates') {
               final ratesData = data['data'] as Map<String, dynamic>?;
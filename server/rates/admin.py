@@ -0,0 +1,11 @@
+from django.contrib import admin
+
+from .models import Corridor
+
+
+@admin.register(Corridor)
+class CorridorAdmin(admin.ModelAdmin):
+    list_display = ('source_currency', 'destination_currency', 'enabled', 'created_at')
+    list_filter = ('enabled', 'source_currency')
+    list_editable = ('enabled',)
+    search_fields = ('source_currency', 'destination_currency')
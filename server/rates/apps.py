@@ -1,8 +1,25 @@
 from django.apps import AppConfig
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_delete, post_save
 
 
 class RatesConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'rates'
 
+    def ready(self):
+        from .corridors import corridor_changed
+        from .db import configure_sqlite_connection
+        from .models import Corridor
 
+        connection_created.connect(configure_sqlite_connection, dispatch_uid='rates.sqlite_pragmas')
+        # Every process picks up corridor edits within RATES_CORRIDOR_CHECK_SECONDS
+        post_save.connect(corridor_changed, sender=Corridor, dispatch_uid='rates.corridor_saved')
+        post_delete.connect(corridor_changed, sender=Corridor, dispatch_uid='rates.corridor_deleted')
+
+        if settings.RATES_WARM_ON_START:
+            # Only touches the local snapshot file, never Redis or the database
+            from .warmup import load_snapshot
+
+            load_snapshot()
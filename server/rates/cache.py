@@ -1,16 +1,155 @@
+import logging
+import time
+from django.conf import settings
 from django.core.cache import cache
-from typing import Optional, Dict, Any
+from django_redis import get_redis_connection
+from typing import Any, Optional, Dict, Iterable, Tuple
+from .quotes import RateQuote
+from .timing import timed
 
+logger = logging.getLogger(__name__)
 
-def _key(source_currency: str, destination_currency: str) -> str:
+# Process-local layer in front of Redis. Entries live for a few seconds so
+# workers pick up the poller's writes quickly (0 disables it).
+LOCAL_TTL_SECONDS = float(getattr(settings, 'RATES_LOCAL_CACHE_SECONDS', 5))
+
+_local: Dict[str, Tuple[float, Any]] = {}
+
+# Last resort behind Redis, seeded from the startup snapshot: used only when Redis
+# misses or is unreachable, and each entry expires when its rate goes stale.
+_fallback: Dict[str, Tuple[float, RateQuote]] = {}
+
+
+def rate_key(source_currency: str, destination_currency: str) -> str:
     return f"fxrate:{source_currency.upper()}:{destination_currency.upper()}"
 
 
-def get_rate(source_currency: str, destination_currency: str) -> Optional[Dict[str, Any]]:
-    return cache.get(_key(source_currency, destination_currency))
+def _load(value) -> Optional[RateQuote]:
+    if value is None:
+        return None
+    if isinstance(value, dict):
+        # Entry written before quotes were cached as encoded JSON
+        return RateQuote.from_flutterwave(value)
+    return RateQuote.from_json(value)
+
+
+def _payload_key(name: str) -> str:
+    return f"fxpayload:{name}"
+
+
+def _get_local(key: str, store: Dict[str, Tuple[float, Any]] = _local) -> Any:
+    entry = store.get(key)
+    if entry is None:
+        return None
+    if entry[0] < time.monotonic():
+        store.pop(key, None)
+        return None
+    return entry[1]
+
+
+def _set_local(key: str, value: Any, ttl_seconds: float = LOCAL_TTL_SECONDS) -> None:
+    if ttl_seconds > 0:
+        _local[key] = (time.monotonic() + ttl_seconds, value)
+
+
+@timed('cache')
+def get_rate(source_currency: str, destination_currency: str) -> Optional[RateQuote]:
+    key = rate_key(source_currency, destination_currency)
+    quote = _get_local(key)
+    if quote is None:
+        try:
+            quote = _load(cache.get(key))
+        except Exception as e:
+            logger.warning("Failed to read %s from Redis: %s", key, e)
+        if quote is not None:
+            _set_local(key, quote)
+        elif _fallback:
+            quote = _get_local(key, _fallback)
+    return quote
+
+
+@timed('cache')
+def get_rates(pairs: Iterable[Tuple[str, str]],
+              keys: Optional[Dict[Tuple[str, str], str]] = None) -> Dict[Tuple[str, str], RateQuote]:
+    """
+    Look up several corridors in one round trip. Missing corridors are left out.
+    keys maps pairs to precomputed cache keys (see CorridorIndex.cache_keys).
+    """
+    found = {}
+    remote = {}
+    for source, destination in pairs:
+        key = keys.get((source, destination)) if keys else None
+        if key is None:
+            key = rate_key(source, destination)
+        quote = _get_local(key)
+        if quote is None:
+            remote[key] = (source, destination)
+        else:
+            found[(source, destination)] = quote
+    if remote:
+        try:
+            values = cache.get_many(list(remote))
+        except Exception as e:
+            logger.warning("Failed to read rates from Redis: %s", e)
+            values = {}
+        for key, value in values.items():
+            quote = _load(value)
+            if quote is not None:
+                _set_local(key, quote)
+                found[remote[key]] = quote
+        if _fallback:
+            for key, pair in remote.items():
+                if pair not in found:
+                    quote = _get_local(key, _fallback)
+                    if quote is not None:
+                        found[pair] = quote
+    return found
+
+
+@timed('cache')
+def set_rate(source_currency: str, destination_currency: str, quote: RateQuote, ttl_seconds: int = 120) -> None:
+    key = rate_key(source_currency, destination_currency)
+    cache.set(key, quote.encode(), ttl_seconds)
+    _set_local(key, quote)
+
+
+@timed('cache')
+def set_rates(entries: Iterable[Tuple[RateQuote, float]]) -> None:
+    """Store many quotes in one pipelined write, each with its own TTL in seconds."""
+    pipe = get_redis_connection('default').pipeline()
+    queued = False
+    for quote, ttl_seconds in entries:
+        key = rate_key(quote.source_currency, quote.destination_currency)
+        cache.set(key, quote.encode(), max(int(ttl_seconds), 1), client=pipe)
+        _set_local(key, quote, min(ttl_seconds, LOCAL_TTL_SECONDS))
+        queued = True
+    if queued:
+        pipe.execute()
+
+
+def prime_fallback(entries: Iterable[Tuple[RateQuote, float]]) -> None:
+    """Seed the fallback layer, e.g. from the on-disk snapshot, with a TTL in seconds per quote."""
+    now = time.monotonic()
+    for quote, ttl_seconds in entries:
+        if ttl_seconds > 0:
+            key = rate_key(quote.source_currency, quote.destination_currency)
+            _fallback[key] = (now + ttl_seconds, quote)
 
 
-def set_rate(source_currency: str, destination_currency: str, payload: Dict[str, Any], ttl_seconds: int = 120) -> None:
-    cache.set(_key(source_currency, destination_currency), payload, ttl_seconds)
+@timed('cache')
+def get_payload(name: str) -> Optional[Dict[str, bytes]]:
+    """Prebuilt response body, as {content-coding: bytes}."""
+    key = _payload_key(name)
+    variants = _get_local(key)
+    if variants is None:
+        variants = cache.get(key)
+        if variants is not None:
+            _set_local(key, variants)
+    return variants
 
 
+@timed('cache')
+def set_payload(name: str, variants: Dict[str, bytes], ttl_seconds: int = 120) -> None:
+    key = _payload_key(name)
+    cache.set(key, variants, ttl_seconds)
+    _set_local(key, variants)
@@ -0,0 +1,75 @@
+import gzip
+from typing import Dict
+
+from django.http import HttpResponse
+from django.middleware.gzip import GZipMiddleware as DjangoGZipMiddleware
+from django.utils.cache import patch_vary_headers
+
+try:
+    import brotli
+except ImportError:  # brotli is optional, gzip is always available
+    brotli = None
+
+# Preferred first when the client accepts several with the same weight
+PREFERENCE = ('br', 'gzip', 'identity')
+
+
+def compress_variants(body: bytes) -> Dict[str, bytes]:
+    """
+    Every encoding of body we can serve. Meant to be computed once per
+    payload version and cached, not per request.
+    """
+    variants = {
+        'identity': body,
+        'gzip': gzip.compress(body, compresslevel=9, mtime=0),
+    }
+    if brotli is not None:
+        variants['br'] = brotli.compress(body, quality=11, mode=brotli.MODE_TEXT)
+    return variants
+
+
+def negotiate(accept_encoding: str, available) -> str:
+    """Pick the best encoding from an Accept-Encoding header."""
+    weights = {}
+    for part in accept_encoding.split(','):
+        coding, _, params = part.strip().partition(';')
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        q = 1.0
+        params = params.strip()
+        if params.startswith('q='):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        weights[coding] = q
+
+    best, best_q = 'identity', 0.0
+    for coding in PREFERENCE:
+        if coding not in available:
+            continue
+        # identity is always acceptable, but only preferred when asked for explicitly
+        q = weights.get(coding, weights.get('*', 0.001 if coding == 'identity' else 0.0))
+        if q > best_q:
+            best, best_q = coding, q
+    return best
+
+
+def variant_response(variants: Dict[str, bytes], request, content_type: str = 'application/json') -> HttpResponse:
+    """Serve the precompressed variant the client accepts best."""
+    coding = negotiate(request.META.get('HTTP_ACCEPT_ENCODING', ''), variants)
+    response = HttpResponse(variants[coding], content_type=content_type)
+    if coding != 'identity':
+        response['Content-Encoding'] = coding
+    patch_vary_headers(response, ('Accept-Encoding',))
+    return response
+
+
+class GZipMiddleware(DjangoGZipMiddleware):
+    """Django's GZipMiddleware, minus event streams, which must reach the client unbuffered."""
+
+    def process_response(self, request, response):
+        if response.get('Content-Type', '').startswith('text/event-stream'):
+            return response
+        return super().process_response(request, response)
@@ -1,7 +1,28 @@
 import json
+from typing import Optional
+from urllib.parse import parse_qs
+from asgiref.sync import sync_to_async
 from channels.generic.websocket import AsyncWebsocketConsumer
 from channels.db import database_sync_to_async
+from .corridors import get_corridors
+from .events import events_since, latest_seq
 from .models import ExchangeRate
+from .payloads import snapshot_quotes
+from .quotes import RateQuote, encode_envelope, encode_quote_map
+
+ALL_RATES_UPDATE_FRAME = encode_envelope(b'{}', type='all_rates_update').decode()
+
+
+def encode_rate_update(key: str, rate: bytes, seq: Optional[str] = None) -> str:
+    fields = {'type': 'rate_update'}
+    if seq:
+        fields['seq'] = seq
+    return encode_envelope(b'{"key":"%s","rate":%s}' % (key.encode(), rate), **fields).decode()
+
+
+def rate_update_frame(quote: RateQuote, seq: Optional[str] = None) -> str:
+    """Text frame pushed to every client when a corridor is refreshed."""
+    return encode_rate_update(quote.key, quote.encode(), seq)
 
 
 class RatesConsumer(AsyncWebsocketConsumer):
@@ -12,8 +33,14 @@ class RatesConsumer(AsyncWebsocketConsumer):
         await self.accept()
         # Join rates update group
         await self.channel_layer.group_add('rates_updates', self.channel_name)
-        # Send all current rates on connection
-        await self.send_all_rates()
+        # A reconnecting client passes ?last_seq=<seq> to only get what it missed
+        query = parse_qs(self.scope.get('query_string', b'').decode())
+        last_seq = query.get('last_seq', [None])[0]
+        if last_seq:
+            await self.resume(last_seq)
+        else:
+            # Send all current rates on connection
+            await self.send_all_rates()
 
     async def disconnect(self, close_code):
         """Handle WebSocket disconnection."""
@@ -28,6 +55,8 @@ class RatesConsumer(AsyncWebsocketConsumer):
 
             if message_type == 'get_all_rates':
                 await self.send_all_rates()
+            elif message_type == 'resume':
+                await self.resume(str(data.get('last_seq') or ''))
             elif message_type == 'get_rate':
                 source_currency = data.get('source_currency')
                 destination_currency = data.get('destination_currency')
@@ -37,101 +66,56 @@ class RatesConsumer(AsyncWebsocketConsumer):
             pass
 
     async def rate_update(self, event):
-        """Send rate update to WebSocket."""
-        await self.send(text_data=json.dumps({
-            'type': 'rate_update',
-            'data': event['data']
-        }))
+        """Send rate update to WebSocket (the poller encodes the frame once for all clients)."""
+        await self.send(text_data=event['frame'])
 
     async def all_rates_update(self, event):
         """Send all rates update to WebSocket."""
-        await self.send(text_data=json.dumps({
-            'type': 'all_rates_update',
-            'data': event['data']
-        }))
+        await self.send(text_data=ALL_RATES_UPDATE_FRAME)
+
+    async def resume(self, last_seq: str):
+        """Replay the rate updates after last_seq, or send a full snapshot if they aged out."""
+        missed = await sync_to_async(events_since)(last_seq)
+        if missed is None:
+            await self.send_all_rates()
+            return
+        for seq, key, rate in missed:
+            await self.send(text_data=encode_rate_update(key, rate, seq))
 
     async def send_all_rates(self):
-        """Send all rates for all source currencies."""
+        """Send all rates for all source currencies, tagged with the event log position they include."""
+        # Read the position first: events after it may already be in the snapshot,
+        # which is harmless, but none before it can be missing.
+        seq = await sync_to_async(latest_seq)()
         all_rates = await self.get_all_rates_from_db()
-        await self.send(text_data=json.dumps({
-            'type': 'all_rates',
-            'data': all_rates
-        }))
+        fields = {'type': 'all_rates'}
+        if seq:
+            fields['seq'] = seq
+        await self.send(text_data=encode_envelope(all_rates, **fields).decode())
 
     async def send_rate(self, source_currency: str, destination_currency: str):
         """Send a specific rate."""
         rate = await self.get_rate_from_db(source_currency, destination_currency)
         if rate:
-            await self.send(text_data=json.dumps({
-                'type': 'rate',
-                'data': rate
-            }))
+            await self.send(text_data=encode_envelope(rate.encode(), type='rate').decode())
 
     @database_sync_to_async
-    def get_all_rates_from_db(self):
-        """Get all rates from database."""
+    def get_all_rates_from_db(self) -> bytes:
+        """Get all rates from database, encoded as {"USD_NGN": quote, ...}."""
         try:
-            source_currencies = ['USD', 'CAD', 'GBP', 'EUR']
-            destination_currencies = [
-                'XOF', 'XAF', 'EGP', 'ETB', 'GHS', 'KES',
-                'MAD', 'NGN', 'ZAR', 'UGX', 'ZMW'
-            ]
-
-            results = {}
-            for source in source_currencies:
-                for dest in destination_currencies:
-                    if source == dest:
-                        continue
-                    try:
-                        rate_obj = ExchangeRate.objects.get(
-                            source_currency=source,
-                            destination_currency=dest
-                        )
-                        results[f"{source}_{dest}"] = {
-                            "status": "success",
-                            "message": "Transfer amount fetched",
-                            "data": {
-                                "rate": float(rate_obj.rate),
-                                "source": {
-                                    "currency": rate_obj.source_currency,
-                                    "amount": float(rate_obj.source_amount)
-                                },
-                                "destination": {
-                                    "currency": rate_obj.destination_currency,
-                                    "amount": float(rate_obj.destination_amount)
-                                }
-                            }
-                        }
-                    except ExchangeRate.DoesNotExist:
-                        pass
-            return results
+            return encode_quote_map(snapshot_quotes(get_corridors()))
         except Exception:
             # Database table might not exist yet, return empty dict
-            return {}
+            return b'{}'
 
     @database_sync_to_async
     def get_rate_from_db(self, source_currency: str, destination_currency: str):
         """Get a specific rate from database."""
         try:
-            rate_obj = ExchangeRate.objects.get(
+            row = ExchangeRate.objects.values_list(*RateQuote.FIELDS).get(
                 source_currency=source_currency.upper(),
                 destination_currency=destination_currency.upper()
             )
-            return {
-                "status": "success",
-                "message": "Transfer amount fetched",
-                "data": {
-                    "rate": float(rate_obj.rate),
-                    "source": {
-                        "currency": rate_obj.source_currency,
-                        "amount": float(rate_obj.source_amount)
-                    },
-                    "destination": {
-                        "currency": rate_obj.destination_currency,
-                        "amount": float(rate_obj.destination_amount)
-                    }
-                }
-            }
+            return RateQuote.from_row(row)
         except ExchangeRate.DoesNotExist:
             return None
-
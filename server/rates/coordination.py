@@ -0,0 +1,226 @@
+import hashlib
+import logging
+import os
+import socket
+import threading
+import time
+import uuid
+from typing import Optional, Tuple
+
+from django_redis import get_redis_connection
+
+logger = logging.getLogger(__name__)
+
+MODES = ('none', 'shard', 'leader')
+
+MEMBERS_KEY = "fxpoll:members"
+LEADER_KEY = "fxpoll:leader"
+PAIR_CLAIM_PREFIX = "fxpoll:claim"
+CYCLE_KEY = "fxpoll:cycle:finished"
+
+# Mark this member's pass as finished (ARGV[2] = '1' if it updated anything).
+# Once every live member (ARGV[4..]) has finished, reset for the next cycle and
+# return 1 if any of them updated something; otherwise return 0.
+_FINISH_CYCLE = """
+redis.call('HSET', KEYS[1], ARGV[1], ARGV[2])
+redis.call('PEXPIRE', KEYS[1], ARGV[3])
+for i = 4, #ARGV do
+    if redis.call('HEXISTS', KEYS[1], ARGV[i]) == 0 then
+        return 0
+    end
+end
+local flags = redis.call('HVALS', KEYS[1])
+redis.call('DEL', KEYS[1])
+for _, flag in ipairs(flags) do
+    if flag == '1' then
+        return 1
+    end
+end
+return 0
+"""
+
+# Record a heartbeat (scored with Redis server time so host clocks don't matter),
+# drop members whose lease ran out and return the live ones.
+_HEARTBEAT = """
+local t = redis.call('TIME')
+local now = tonumber(t[1]) * 1000 + math.floor(tonumber(t[2]) / 1000)
+local cutoff = now - tonumber(ARGV[2])
+redis.call('ZADD', KEYS[1], now, ARGV[1])
+redis.call('ZREMRANGEBYSCORE', KEYS[1], '-inf', cutoff)
+redis.call('PEXPIRE', KEYS[1], ARGV[2] * 10)
+return redis.call('ZRANGEBYSCORE', KEYS[1], cutoff, '+inf')
+"""
+
+# Take the leader lease if it is free, or extend it if we already hold it.
+_ACQUIRE_OR_RENEW = """
+local holder = redis.call('GET', KEYS[1])
+if holder == ARGV[1] then
+    redis.call('PEXPIRE', KEYS[1], ARGV[2])
+    return 1
+end
+if not holder then
+    redis.call('SET', KEYS[1], ARGV[1], 'PX', ARGV[2])
+    return 1
+end
+return 0
+"""
+
+_RELEASE_IF_HOLDER = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+
+def _weight(member: str, pair: str) -> int:
+    digest = hashlib.blake2b(f"{member}|{pair}".encode(), digest_size=8).digest()
+    return int.from_bytes(digest, 'big')
+
+
+def shard_owner(members: Tuple[str, ...], source_currency: str, destination_currency: str) -> Optional[str]:
+    """
+    Rendezvous (highest-random-weight) hashing of a corridor onto the live members.
+    Only the corridors of a member that joins or leaves move.
+    """
+    if not members:
+        return None
+    pair = f"{source_currency}_{destination_currency}"
+    return max(members, key=lambda member: _weight(member, pair))
+
+
+class PollerCoordinator:
+    """
+    Lets several poll_rates processes share the corridor set through Redis leases.
+
+    shard:  every live instance refreshes the corridors that hash onto it.
+    leader: one instance holds the leader lease and refreshes everything,
+            the others stay on hot standby and take over when it lapses.
+
+    A background thread heartbeats every third of the lease, so a stopped
+    instance drops out (and its corridors are picked up) within one lease.
+    """
+
+    def __init__(self, mode: str, lease_seconds: float = 10, instance_id: Optional[str] = None):
+        if mode not in MODES or mode == 'none':
+            raise ValueError(f"Unsupported coordination mode: {mode}")
+        self.mode = mode
+        self.lease_ms = max(int(lease_seconds * 1000), 1000)
+        self.instance_id = instance_id or f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+
+        self._redis = get_redis_connection('default')
+        self._heartbeat = self._redis.register_script(_HEARTBEAT)
+        self._acquire_or_renew = self._redis.register_script(_ACQUIRE_OR_RENEW)
+        self._release = self._redis.register_script(_RELEASE_IF_HOLDER)
+        self._finish_cycle = self._redis.register_script(_FINISH_CYCLE)
+
+        self._members: Tuple[str, ...] = (self.instance_id,)
+        self._leader_until = 0.0
+        self._changed = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def members(self) -> Tuple[str, ...]:
+        return self._members
+
+    @property
+    def is_leader(self) -> bool:
+        return time.monotonic() < self._leader_until
+
+    def start(self) -> None:
+        self._beat()
+        self._thread = threading.Thread(target=self._run, name='poller-heartbeat', daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Leave the group so the others take over immediately instead of after the lease."""
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=self.lease_ms / 1000)
+        try:
+            self._redis.zrem(MEMBERS_KEY, self.instance_id)
+            if self.mode == 'leader':
+                self._release(keys=[LEADER_KEY], args=[self.instance_id])
+        except Exception as e:
+            logger.warning("Failed to leave poller group: %s", e)
+
+    def owns(self, source_currency: str, destination_currency: str) -> bool:
+        """Whether this instance is currently responsible for refreshing the corridor."""
+        if self.mode == 'leader':
+            return self.is_leader
+        return shard_owner(self._members, source_currency, destination_currency) == self.instance_id
+
+    def claim(self, source_currency: str, destination_currency: str, ttl_seconds: float) -> bool:
+        """
+        Take a short per-corridor claim before fetching, so a corridor that moves
+        between instances mid-cycle is not fetched twice in the same interval.
+        """
+        key = f"{PAIR_CLAIM_PREFIX}:{source_currency}:{destination_currency}"
+        try:
+            return bool(self._redis.set(key, self.instance_id, nx=True, px=max(int(ttl_seconds * 1000), 1)))
+        except Exception as e:
+            # Prefer a possible duplicate fetch over letting the corridor go stale.
+            logger.warning("Failed to claim %s->%s: %s", source_currency, destination_currency, e)
+            return True
+
+    def finish_cycle(self, updated: bool, ttl_seconds: float) -> bool:
+        """
+        Record that this instance finished its pass over its corridors. Returns
+        True for the one instance that should then do the once-per-cycle work
+        (rebuilding the all-rates payloads and announcing them): the leader in
+        leader mode; in shard mode the last live member to finish, provided
+        any member updated something.
+        """
+        if self.mode == 'leader':
+            return updated and self.is_leader
+        try:
+            return bool(self._finish_cycle(
+                keys=[CYCLE_KEY],
+                args=[self.instance_id, '1' if updated else '0', max(int(ttl_seconds * 1000), 1), *self._members],
+            ))
+        except Exception as e:
+            logger.warning("Failed to record finished poll cycle: %s", e)
+            return updated
+
+    def wait(self, seconds: float) -> bool:
+        """
+        Sleep until the next cycle. Returns True when woken early because
+        this instance gained corridors (shard change or leadership).
+        """
+        woke = self._changed.wait(seconds)
+        self._changed.clear()
+        return woke
+
+    def _run(self) -> None:
+        interval = self.lease_ms / 3000
+        while not self._stop.wait(interval):
+            try:
+                self._beat()
+            except Exception as e:
+                logger.warning("Poller heartbeat failed: %s", e)
+
+    def _beat(self) -> None:
+        started = time.monotonic()
+        live = self._heartbeat(keys=[MEMBERS_KEY], args=[self.instance_id, self.lease_ms])
+        members = tuple(sorted(m.decode() if isinstance(m, bytes) else m for m in live))
+        if self.instance_id not in members:
+            members = tuple(sorted(members + (self.instance_id,)))
+
+        if self.mode == 'shard':
+            if members != self._members:
+                logger.info("Poller group changed: %s", ', '.join(members))
+                self._members = members
+                self._changed.set()
+            return
+
+        self._members = members
+        was_leader = self.is_leader
+        if self._acquire_or_renew(keys=[LEADER_KEY], args=[self.instance_id, self.lease_ms]):
+            # Measured from before the round trip so we never outlive the Redis lease.
+            self._leader_until = started + self.lease_ms / 1000
+            if not was_leader:
+                logger.info("Poller %s is now leader", self.instance_id)
+                self._changed.set()
+        else:
+            self._leader_until = 0.0
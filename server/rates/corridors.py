@@ -0,0 +1,138 @@
+import logging
+import sys
+import threading
+import time
+from typing import Dict, FrozenSet, Optional, Tuple
+
+from django.conf import settings
+from django.db import transaction
+from django_redis import get_redis_connection
+
+from .cache import rate_key
+from .models import Corridor
+
+logger = logging.getLogger(__name__)
+
+# Bumped whenever the corridor table changes; every process reloads when it moves
+VERSION_KEY = "fxcorridors:version"
+
+Pair = Tuple[str, str]
+
+
+class CorridorIndex:
+    """
+    The enabled corridors, with everything the request paths need worked out
+    once per load: pairs grouped by source currency, interned cache keys and
+    corridor keys ("USD_NGN"). Lookups cost the same however many corridors exist.
+    """
+
+    __slots__ = ('version', 'pairs', 'keys', 'sources', 'destinations', 'by_source', 'cache_keys')
+
+    def __init__(self, pairs, version: Optional[int] = None):
+        self.version = version
+        self.pairs: Tuple[Pair, ...] = tuple(
+            (sys.intern(source), sys.intern(destination))
+            for source, destination in dict.fromkeys(pairs)
+            if source != destination
+        )
+        self.keys: FrozenSet[str] = frozenset(sys.intern(f"{s}_{d}") for s, d in self.pairs)
+        self.sources: Tuple[str, ...] = tuple(dict.fromkeys(s for s, _ in self.pairs))
+        self.destinations: Tuple[str, ...] = tuple(dict.fromkeys(d for _, d in self.pairs))
+        by_source: Dict[str, list] = {}
+        for pair in self.pairs:
+            by_source.setdefault(pair[0], []).append(pair)
+        self.by_source: Dict[str, Tuple[Pair, ...]] = {s: tuple(p) for s, p in by_source.items()}
+        self.cache_keys: Dict[Pair, str] = {pair: sys.intern(rate_key(*pair)) for pair in self.pairs}
+
+    def __len__(self):
+        return len(self.pairs)
+
+    def __contains__(self, pair) -> bool:
+        return pair in self.cache_keys
+
+    def for_source(self, source_currency: str) -> Tuple[Pair, ...]:
+        return self.by_source.get(source_currency, ())
+
+
+_index: Optional[CorridorIndex] = None
+_checked_at = 0.0
+_stale = False
+_lock = threading.Lock()
+
+
+def _redis():
+    return get_redis_connection('default')
+
+
+def current_version() -> Optional[int]:
+    """Registry version in Redis (0 if never bumped), or None if Redis is unavailable."""
+    try:
+        return int(_redis().get(VERSION_KEY) or 0)
+    except Exception as e:
+        logger.warning("Failed to read corridor version: %s", e)
+        return None
+
+
+def bump_version() -> None:
+    """Tell every process to reload the registry on its next check."""
+    try:
+        _redis().incr(VERSION_KEY)
+    except Exception as e:
+        logger.warning("Failed to bump corridor version: %s", e)
+    # This process reloads straight away
+    invalidate()
+
+
+def invalidate() -> None:
+    """Reload this process's index on the next get_corridors() call."""
+    global _checked_at, _stale
+    _stale = True
+    _checked_at = 0.0
+
+
+def corridor_changed(sender, **kwargs) -> None:
+    """
+    post_save / post_delete handler for Corridor. Bumps only once the change
+    is committed, so no process can reload the old rows under the new version.
+    """
+    transaction.on_commit(bump_version, using=kwargs.get('using'))
+
+
+def load_corridors(version: Optional[int] = None) -> CorridorIndex:
+    """Build the index from the database, in a single query."""
+    pairs = Corridor.objects.filter(enabled=True).order_by('pk').values_list(
+        'source_currency', 'destination_currency'
+    )
+    return CorridorIndex(list(pairs), version)
+
+
+def get_corridors() -> CorridorIndex:
+    """
+    The process-wide corridor index. Loaded on first use, then reloaded only
+    when the Redis version has moved, which is checked at most every
+    RATES_CORRIDOR_CHECK_SECONDS. Sync code only (it may query the database).
+    """
+    global _index, _checked_at, _stale
+    index = _index
+    now = time.monotonic()
+    if index is not None and now - _checked_at < settings.RATES_CORRIDOR_CHECK_SECONDS:
+        return index
+
+    with _lock:
+        if _index is not None and now - _checked_at < settings.RATES_CORRIDOR_CHECK_SECONDS:
+            return _index
+        version = current_version()
+        if _stale or _index is None or _index.version is None or (
+            version is not None and version != _index.version
+        ):
+            try:
+                _index = load_corridors(version)
+                _stale = False
+            except Exception as e:
+                # Corridor table missing (migrations not run) or database down: serve
+                # what we had, or nothing, and try again on the next check
+                logger.warning("Failed to load corridors: %s", e)
+                if _index is None:
+                    _index = CorridorIndex((), None)
+        _checked_at = now
+        return _index
@@ -0,0 +1,50 @@
+from django.conf import settings
+from django.db import connections
+
+REPLICA = 'replica'
+PRIMARY = 'default'
+
+
+class RatesRouter:
+    """
+    Route rate lookups to the read-only replica connection (when one is
+    configured) and every write, e.g. from save_rate_to_db, to the primary.
+    Only ExchangeRate reads go to the replica: the corridor registry is
+    reloaded right after a change and must not see a lagging copy.
+    """
+
+    app_label = 'rates'
+    replica_models = {'exchangerate'}
+
+    def db_for_read(self, model, **hints):
+        if (model._meta.app_label == self.app_label and model._meta.model_name in self.replica_models
+                and REPLICA in connections.databases):
+            return REPLICA
+        return None
+
+    def db_for_write(self, model, **hints):
+        if model._meta.app_label == self.app_label:
+            return PRIMARY
+        return None
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Both aliases point at the same data
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db == REPLICA:
+            return False
+        return None
+
+
+def configure_sqlite_connection(sender, connection, **kwargs):
+    """Apply SQLITE_PRAGMAS to every new SQLite connection (connection_created handler)."""
+    if connection.vendor != 'sqlite':
+        return
+    read_only = 'mode=ro' in str(connection.settings_dict['NAME'])
+    with connection.cursor() as cursor:
+        for pragma, value in getattr(settings, 'SQLITE_PRAGMAS', {}).items():
+            # journal_mode is persisted in the file and can only be changed by a writer
+            if read_only and pragma == 'journal_mode':
+                continue
+            cursor.execute(f"PRAGMA {pragma}={value}")
@@ -0,0 +1,101 @@
+import logging
+import re
+from typing import List, Optional, Tuple
+
+from django.conf import settings
+from django_redis import get_redis_connection
+
+from .quotes import RateQuote
+
+logger = logging.getLogger(__name__)
+
+# Every rate change, in order. Entry IDs (e.g. "1718000000000-0") are the
+# sequence numbers clients resume from.
+STREAM_KEY = "fxrates:events"
+# Last quote logged per corridor, so only actual changes are appended
+LAST_LOGGED_KEY = "fxrates:last_logged"
+
+# Append the quote unless it is the one last logged for its corridor (nil when unchanged).
+_APPEND_IF_CHANGED = """
+if redis.call('HGET', KEYS[2], ARGV[1]) == ARGV[2] then
+    return false
+end
+redis.call('HSET', KEYS[2], ARGV[1], ARGV[2])
+return redis.call('XADD', KEYS[1], 'MAXLEN', '~', ARGV[3], '*', 'key', ARGV[1], 'rate', ARGV[2])
+"""
+
+_SEQ_RE = re.compile(r'^\d+(-\d+)?$')
+
+RateEvent = Tuple[str, str, bytes]  # (seq, corridor key, encoded quote)
+
+
+def _redis():
+    return get_redis_connection('default')
+
+
+def _decode(value) -> str:
+    return value.decode() if isinstance(value, bytes) else value
+
+
+def seq_order(seq: str) -> Tuple[int, int]:
+    ms, _, counter = seq.partition('-')
+    return int(ms), int(counter or 0)
+
+
+def append_rate_event(quote: RateQuote) -> Tuple[bool, Optional[str]]:
+    """
+    Append a rate change to the bounded event log, in one atomic round trip,
+    unless the quote equals the last one logged for its corridor (by any
+    poller, before or after a restart). Returns (changed, sequence ID).
+    """
+    try:
+        redis = _redis()
+        seq = redis.eval(
+            _APPEND_IF_CHANGED, 2, STREAM_KEY, LAST_LOGGED_KEY,
+            quote.key, quote.encode(), settings.RATES_EVENT_LOG_LENGTH,
+        )
+    except Exception as e:
+        logger.warning("Failed to append rate event for %s: %s", quote.key, e)
+        # Broadcast anyway; clients just can't resume past this one
+        return True, None
+    if seq is None:
+        return False, None
+    return True, _decode(seq)
+
+
+def latest_seq() -> Optional[str]:
+    """Sequence ID of the newest event, or None if the log is empty or unavailable."""
+    try:
+        entries = _redis().xrevrange(STREAM_KEY, count=1)
+    except Exception as e:
+        logger.warning("Failed to read rate event log: %s", e)
+        return None
+    return _decode(entries[0][0]) if entries else None
+
+
+def events_since(seq: str) -> Optional[List[RateEvent]]:
+    """
+    Events after seq, oldest first. Returns None when the caller needs a
+    full snapshot instead: seq is malformed, has been trimmed from the log,
+    is ahead of the log (e.g. after a Redis flush), or too much was missed.
+    """
+    if not seq or not _SEQ_RE.match(seq):
+        return None
+    try:
+        redis = _redis()
+        oldest = redis.xrange(STREAM_KEY, count=1)
+        newest = redis.xrevrange(STREAM_KEY, count=1)
+        if not oldest:
+            return None
+        wanted = seq_order(seq)
+        if wanted < seq_order(_decode(oldest[0][0])) or wanted > seq_order(_decode(newest[0][0])):
+            return None
+        limit = settings.RATES_RESUME_MAX_EVENTS
+        entries = redis.xrange(STREAM_KEY, min=f"({seq}", count=limit + 1)
+    except Exception as e:
+        logger.warning("Failed to read rate event log: %s", e)
+        return None
+
+    if len(entries) > limit:
+        return None
+    return [(_decode(entry_id), _decode(fields[b'key']), fields[b'rate']) for entry_id, fields in entries]
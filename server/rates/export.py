@@ -0,0 +1,119 @@
+import csv
+from datetime import datetime, time as dt_time, timezone as dt_timezone
+from typing import AsyncIterator, Iterable, Iterator, Optional
+
+import orjson
+from asgiref.sync import sync_to_async
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from .models import ExchangeRate
+
+FORMATS = ('ndjson', 'csv')
+CONTENT_TYPES = {
+    'ndjson': 'application/x-ndjson',
+    'csv': 'text/csv',
+}
+EXPORT_FIELDS = ('source_currency', 'destination_currency', 'rate', 'source_amount', 'destination_amount', 'last_updated')
+
+# Rows fetched per database round trip, and rows per chunk written to the client
+FETCH_SIZE = 2000
+CHUNK_ROWS = 500
+
+
+def parse_timestamp(value: str) -> datetime:
+    """ISO 8601 datetime or date (midnight UTC). Raises ValueError if it is neither."""
+    parsed = parse_datetime(value)
+    if parsed is None:
+        day = parse_date(value)
+        if day is None:
+            raise ValueError(f"Invalid date: {value}")
+        parsed = datetime.combine(day, dt_time.min)
+    if timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed, dt_timezone.utc)
+    return parsed
+
+
+def export_rows(source_currency: Optional[str] = None, destination_currency: Optional[str] = None,
+                pairs: Optional[Iterable[str]] = None, since: Optional[datetime] = None,
+                until: Optional[datetime] = None) -> Iterator[tuple]:
+    """
+    Matching ExchangeRate rows as EXPORT_FIELDS tuples, streamed from a
+    server-side cursor so memory stays flat however many rows there are.
+    """
+    rows = ExchangeRate.objects.all()
+    if source_currency:
+        rows = rows.filter(source_currency=source_currency.upper())
+    if destination_currency:
+        rows = rows.filter(destination_currency=destination_currency.upper())
+    if pairs:
+        pair_filter = Q()
+        for pair in pairs:
+            source, _, destination = pair.upper().partition('_')
+            pair_filter |= Q(source_currency=source, destination_currency=destination)
+        rows = rows.filter(pair_filter)
+    if since:
+        rows = rows.filter(last_updated__gte=since)
+    if until:
+        rows = rows.filter(last_updated__lt=until)
+    return rows.order_by('pk').values_list(*EXPORT_FIELDS).iterator(chunk_size=FETCH_SIZE)
+
+
+def _ndjson_line(row) -> bytes:
+    source_currency, destination_currency, rate, source_amount, destination_amount, last_updated = row
+    # Decimals as strings so finance gets the stored values exactly
+    return orjson.dumps({
+        'source_currency': source_currency,
+        'destination_currency': destination_currency,
+        'rate': str(rate),
+        'source_amount': str(source_amount),
+        'destination_amount': str(destination_amount),
+        'last_updated': last_updated.isoformat(),
+    }) + b'\n'
+
+
+class _Echo:
+    """File-like object that hands csv.writer's output straight back."""
+
+    def write(self, value):
+        return value
+
+
+def encode_rows(rows: Iterable[tuple], export_format: str) -> Iterator[bytes]:
+    """Encode rows as NDJSON or CSV, yielding one chunk per CHUNK_ROWS rows."""
+    if export_format == 'csv':
+        writer = csv.writer(_Echo())
+        # Header goes out before the first database fetch
+        yield writer.writerow(EXPORT_FIELDS).encode()
+
+        def encode(row):
+            return writer.writerow(row[:5] + (row[5].isoformat(),)).encode()
+    else:
+        encode = _ndjson_line
+
+    chunk = []
+    for row in rows:
+        chunk.append(encode(row))
+        if len(chunk) >= CHUNK_ROWS:
+            yield b''.join(chunk)
+            chunk = []
+    if chunk:
+        yield b''.join(chunk)
+
+
+async def aiter_chunks(chunks: Iterator[bytes]) -> AsyncIterator[bytes]:
+    """
+    Drive a synchronous chunk generator from async code one chunk at a time.
+    Django would otherwise read a sync iterator into a list under ASGI.
+    """
+    next_chunk = sync_to_async(lambda: next(chunks, None), thread_sensitive=True)
+    try:
+        while True:
+            chunk = await next_chunk()
+            if chunk is None:
+                return
+            yield chunk
+    finally:
+        # Release the database cursor if the client went away mid-export
+        await sync_to_async(chunks.close, thread_sensitive=True)()
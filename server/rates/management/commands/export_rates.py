@@ -0,0 +1,55 @@
+import sys
+from django.core.management.base import BaseCommand, CommandError
+from rates.export import FORMATS, encode_rows, export_rows, parse_timestamp
+
+
+class Command(BaseCommand):
+    help = "Streams stored exchange rates to a file (or stdout) as NDJSON or CSV."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--format',
+            choices=FORMATS,
+            default='ndjson',
+            help='Output format (default: ndjson)'
+        )
+        parser.add_argument(
+            '--output', '-o',
+            help='File to write to (default: stdout)'
+        )
+        parser.add_argument('--source-currency', help='Only rates from this currency')
+        parser.add_argument('--destination-currency', help='Only rates to this currency')
+        parser.add_argument(
+            '--pair',
+            action='append',
+            default=[],
+            help='Only this corridor, e.g. USD_NGN (repeatable)'
+        )
+        parser.add_argument('--since', help='Only rates updated at or after this ISO date/datetime')
+        parser.add_argument('--until', help='Only rates updated before this ISO date/datetime')
+
+    def handle(self, *args, **options):
+        try:
+            since = parse_timestamp(options['since']) if options['since'] else None
+            until = parse_timestamp(options['until']) if options['until'] else None
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        chunks = encode_rows(export_rows(
+            source_currency=options['source_currency'],
+            destination_currency=options['destination_currency'],
+            pairs=options['pair'],
+            since=since,
+            until=until,
+        ), options['format'])
+
+        if options['output']:
+            with open(options['output'], 'wb') as f:
+                for chunk in chunks:
+                    f.write(chunk)
+            self.stderr.write(self.style.SUCCESS(f"Exported rates to {options['output']}"))
+        else:
+            out = sys.stdout.buffer
+            for chunk in chunks:
+                out.write(chunk)
+            out.flush()
@@ -1,32 +1,22 @@
+import os
 import time
 from django.core.management.base import BaseCommand
 from channels.layers import get_channel_layer
 from asgiref.sync import async_to_sync
 from rates.cache import set_rate
+from rates.consumers import rate_update_frame
+from rates.corridors import get_corridors
+from rates.coordination import MODES, PollerCoordinator
+from rates.events import append_rate_event
+from rates.payloads import refresh_all_rates_payloads
+from rates.quotes import RateQuote
 from rates.services import fetch_flutterwave_rate, save_rate_to_db, to_backend_shape
+from rates.warmup import warm_cache, write_snapshot
 
 
 class Command(BaseCommand):
     help = "Fetches all exchange rates from Flutterwave and stores them in the database. Runs every 10 minutes."
 
-    # Source currencies (From)
-    SOURCE_CURRENCIES = ['USD', 'CAD', 'GBP', 'EUR']
-    
-    # Destination currencies (To) - African countries
-    DESTINATION_CURRENCIES = [
-        'XOF',  # Benin, Burkina Faso, Guinea Bissau, Mali, Senegal, Togo
-        'XAF',  # Cameroon, CAR, Chad, Equatorial Guinea, Gabon, Rep. Congo
-        'EGP',  # Egypt
-        'ETB',  # Ethiopia
-        'GHS',  # Ghana
-        'KES',  # Kenya
-        'MAD',  # Morocco
-        'NGN',  # Nigeria
-        'ZAR',  # South Africa
-        'UGX',  # Uganda
-        'ZMW',  # Zambia
-    ]
-
     def add_arguments(self, parser):
         parser.add_argument(
             '--interval',
@@ -39,94 +29,180 @@ class Command(BaseCommand):
             action='store_true',
             help='Run once and exit (for cron jobs)'
         )
+        parser.add_argument(
+            '--coordination',
+            choices=MODES,
+            default=os.getenv('POLL_COORDINATION', 'none'),
+            help='Multi-instance mode: none (single poller), shard (split corridors) or leader (one active, others standby)'
+        )
+        parser.add_argument(
+            '--lease',
+            type=float,
+            default=float(os.getenv('POLL_LEASE_SECONDS', '10')),
+            help='Seconds without a heartbeat before an instance is considered gone (default: 10)'
+        )
+        parser.add_argument(
+            '--instance-id',
+            default=os.getenv('POLL_INSTANCE_ID'),
+            help='Stable name for this poller instance (default: host:pid:random)'
+        )
 
     def handle(self, *args, **options):
         interval = options['interval']
         run_once = options['once']
-        
-        total_pairs = len(self.SOURCE_CURRENCIES) * len(self.DESTINATION_CURRENCIES)
+
+        coordinator = None
+        if options['coordination'] != 'none':
+            coordinator = PollerCoordinator(
+                options['coordination'],
+                lease_seconds=options['lease'],
+                instance_id=options['instance_id'],
+            )
+            coordinator.start()
+
+        total_pairs = len(get_corridors())
         self.stdout.write(
             self.style.SUCCESS(
                 f"Starting rate fetcher. Will fetch {total_pairs} currency pairs every {interval}s"
             )
         )
+        if coordinator:
+            self.stdout.write(f"Coordination: {coordinator.mode} as {coordinator.instance_id}")
+
+        # Refill Redis from the database straight away, e.g. after a Redis flush
+        try:
+            warmed = warm_cache(ttl_seconds=interval * 2)
+            self.stdout.write(f"Warmed {warmed} fresh stored rates into Redis")
+        except Exception as e:
+            self.stdout.write(self.style.WARNING(f"Failed to warm Redis: {str(e)}"))
+
+        try:
+            while True:
+                self.poll_cycle(interval, coordinator)
+
+                if run_once:
+                    break
+
+                self.stdout.write(f"Waiting {interval}s until next fetch...\n")
+                if coordinator:
+                    # An early wake only picks up newly owned corridors; the already owned ones
+                    # are skipped by their claims, so keep the original deadline for them
+                    deadline = time.monotonic() + interval
+                    while True:
+                        remaining = deadline - time.monotonic()
+                        if remaining <= 0 or not coordinator.wait(remaining):
+                            break
+                        self.stdout.write("Corridor assignment changed, refreshing newly owned pairs\n")
+                        self.poll_cycle(interval, coordinator)
+                else:
+                    time.sleep(interval)
+        finally:
+            if coordinator:
+                coordinator.stop()
 
-        while True:
-            success_count = 0
-            error_count = 0
-            
-            for source_currency in self.SOURCE_CURRENCIES:
-                for dest_currency in self.DESTINATION_CURRENCIES:
-                    # Skip same currency
-                    if source_currency == dest_currency:
-                        continue
-                    
-                    try:
-                        fw_resp = fetch_flutterwave_rate(source_currency, dest_currency)
-                        if fw_resp.get('status') == 'success':
-                            # Save to database
-                            save_rate_to_db(source_currency, dest_currency, fw_resp)
-                            
-                            # Also cache in Redis for faster access
-                            shaped = to_backend_shape(fw_resp)
-                            set_rate(source_currency, dest_currency, shaped, ttl_seconds=interval * 2)
-                            
-                            # Broadcast update via WebSocket
-                            self.broadcast_rate_update(source_currency, dest_currency, shaped)
-                            
-                            success_count += 1
-                            self.stdout.write(
-                                self.style.SUCCESS(f"✓ {source_currency}->{dest_currency}")
-                            )
-                        else:
-                            error_count += 1
-                            self.stdout.write(
-                                self.style.WARNING(
-                                    f"✗ {source_currency}->{dest_currency}: {fw_resp.get('message', 'Unknown error')}"
-                                )
-                            )
-                    except Exception as e:
-                        error_count += 1
-                        self.stdout.write(
-                            self.style.ERROR(f"✗ {source_currency}->{dest_currency}: {str(e)}")
+    def poll_cycle(self, interval: int, coordinator=None):
+        """Fetch every corridor this instance is responsible for."""
+        success_count = 0
+        error_count = 0
+
+        # Picks up corridors added or disabled since the last cycle
+        corridors = get_corridors()
+
+        for source_currency, dest_currency in corridors.pairs:
+            # Skip corridors owned by another instance or fetched by one this interval
+            if coordinator and not (
+                coordinator.owns(source_currency, dest_currency)
+                and coordinator.claim(source_currency, dest_currency, ttl_seconds=interval * 0.9)
+            ):
+                continue
+
+            try:
+                fw_resp = fetch_flutterwave_rate(source_currency, dest_currency)
+                quote = to_backend_shape(fw_resp, source_currency, dest_currency)
+                if quote:
+                    # Save to database (also marks the stored rate as fresh)
+                    save_rate_to_db(quote)
+
+                    # Also cache in Redis for faster access
+                    set_rate(source_currency, dest_currency, quote, ttl_seconds=interval * 2)
+
+                    # Log and broadcast only actual changes, so a resuming client
+                    # gets one frame per changed corridor rather than per fetch
+                    changed = self.broadcast_rate_update(quote)
+
+                    success_count += 1
+                    self.stdout.write(
+                        self.style.SUCCESS(
+                            f"✓ {source_currency}->{dest_currency}" + ("" if changed else " (unchanged)")
+                        )
+                    )
+                else:
+                    error_count += 1
+                    self.stdout.write(
+                        self.style.WARNING(
+                            f"✗ {source_currency}->{dest_currency}: {fw_resp.get('message', 'Unknown error')}"
                         )
-                    
-                    # Small delay to avoid rate limiting
-                    time.sleep(0.5)
-            
-            self.stdout.write(
-                self.style.SUCCESS(
-                    f"\nCompleted: {success_count} successful, {error_count} errors\n"
+                    )
+            except Exception as e:
+                error_count += 1
+                self.stdout.write(
+                    self.style.ERROR(f"✗ {source_currency}->{dest_currency}: {str(e)}")
                 )
+
+            # Small delay to avoid rate limiting
+            time.sleep(0.5)
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"\nCompleted: {success_count} successful, {error_count} errors\n"
             )
-            
-            # Broadcast all rates update after completing all pairs
-            if success_count > 0:
-                self.broadcast_all_rates_update()
-            
-            if run_once:
-                break
-            
-            self.stdout.write(f"Waiting {interval}s until next fetch...\n")
-            time.sleep(interval)
-
-    def broadcast_rate_update(self, source_currency: str, destination_currency: str, rate_data: dict):
-        """Broadcast rate update to all connected WebSocket clients."""
+        )
+
+        # Broadcast all rates update after completing all pairs. With several pollers only the
+        # last to finish rebuilds and announces, once every shard's rates are in, so clients
+        # don't refetch the snapshot N times or before the cycle is complete.
+        if coordinator is None:
+            cycle_complete = success_count > 0
+        else:
+            cycle_complete = coordinator.finish_cycle(success_count > 0, ttl_seconds=interval * 2)
+        if cycle_complete:
+            # Rebuild the compressed AllRatesView bodies before clients come asking for them
+            try:
+                refresh_all_rates_payloads(corridors, ttl_seconds=interval * 2)
+            except Exception as e:
+                self.stdout.write(self.style.WARNING(f"Failed to rebuild rate payloads: {str(e)}"))
+            self.broadcast_all_rates_update()
+
+        # Refresh the startup snapshot read by new web workers
+        try:
+            write_snapshot()
+        except Exception as e:
+            self.stdout.write(self.style.WARNING(f"Failed to write rates snapshot: {str(e)}"))
+
+    def broadcast_rate_update(self, quote: RateQuote) -> bool:
+        """
+        Record the rate change in the event log and broadcast it to all connected
+        WebSocket clients. Does neither, and returns False, if the quote is the one
+        last logged for its corridor.
+        """
+        changed, seq = append_rate_event(quote)
+        if not changed:
+            return False
         try:
             channel_layer = get_channel_layer()
             async_to_sync(channel_layer.group_send)(
                 'rates_updates',
                 {
                     'type': 'rate_update',
-                    'data': {
-                        'key': f"{source_currency}_{destination_currency}",
-                        'rate': rate_data
-                    }
+                    'key': quote.key,
+                    'seq': seq,
+                    'frame': rate_update_frame(quote, seq),
                 }
             )
         except Exception as e:
             # Silently fail if WebSocket broadcasting fails
             pass
+        return True
 
     def broadcast_all_rates_update(self):
         """Broadcast that all rates have been updated."""
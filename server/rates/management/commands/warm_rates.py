@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+from rates.warmup import load_fresh_quotes, warm_cache, write_snapshot
+
+
+class Command(BaseCommand):
+    help = "Bulk-loads the fresh stored exchange rates into Redis and writes the startup snapshot. Run after a deploy or a Redis flush."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--ttl',
+            type=int,
+            default=1200,
+            help='Redis TTL in seconds for the warmed rates (default: 1200 = 2 poll intervals)'
+        )
+        parser.add_argument(
+            '--no-snapshot',
+            action='store_true',
+            help='Only warm Redis, do not rewrite the snapshot file'
+        )
+
+    def handle(self, *args, **options):
+        entries = load_fresh_quotes()
+        warm_cache(options['ttl'], entries=entries)
+        self.stdout.write(self.style.SUCCESS(f"Warmed {len(entries)} fresh rates into Redis"))
+
+        if not options['no_snapshot']:
+            path = write_snapshot(entries)
+            self.stdout.write(self.style.SUCCESS(f"Wrote snapshot to {path}"))
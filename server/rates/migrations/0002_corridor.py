@@ -0,0 +1,54 @@
+# Generated by Django 5.2.18 on 2026-10-19 04:20
+
+from django.db import migrations, models
+
+# The corridors the poller, views and consumer used to hard-code
+SOURCE_CURRENCIES = ['USD', 'CAD', 'GBP', 'EUR']
+DESTINATION_CURRENCIES = [
+    'XOF',  # Benin, Burkina Faso, Guinea Bissau, Mali, Senegal, Togo
+    'XAF',  # Cameroon, CAR, Chad, Equatorial Guinea, Gabon, Rep. Congo
+    'EGP',  # Egypt
+    'ETB',  # Ethiopia
+    'GHS',  # Ghana
+    'KES',  # Kenya
+    'MAD',  # Morocco
+    'NGN',  # Nigeria
+    'ZAR',  # South Africa
+    'UGX',  # Uganda
+    'ZMW',  # Zambia
+]
+
+
+def seed_corridors(apps, schema_editor):
+    Corridor = apps.get_model('rates', 'Corridor')
+    Corridor.objects.using(schema_editor.connection.alias).bulk_create([
+        Corridor(source_currency=source, destination_currency=destination)
+        for source in SOURCE_CURRENCIES
+        for destination in DESTINATION_CURRENCIES
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rates', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Corridor',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('source_currency', models.CharField(max_length=3)),
+                ('destination_currency', models.CharField(max_length=3)),
+                ('enabled', models.BooleanField(default=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'db_table': 'corridors',
+                'ordering': ['pk'],
+                'unique_together': {('source_currency', 'destination_currency')},
+            },
+        ),
+        migrations.RunPython(seed_corridors, migrations.RunPython.noop),
+    ]
@@ -23,3 +23,23 @@ class ExchangeRate(models.Model):
     def __str__(self):
         return f"{self.source_currency} -> {self.destination_currency}: {self.rate}"
 
+
+class Corridor(models.Model):
+    """A currency pair the service polls and serves. Changes reach every process without a restart."""
+    source_currency = models.CharField(max_length=3)
+    destination_currency = models.CharField(max_length=3)
+    enabled = models.BooleanField(default=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        db_table = 'corridors'
+        unique_together = [['source_currency', 'destination_currency']]
+        ordering = ['pk']
+
+    def save(self, *args, **kwargs):
+        self.source_currency = self.source_currency.upper()
+        self.destination_currency = self.destination_currency.upper()
+        super().save(*args, **kwargs)
+
+    def __str__(self):
+        return f"{self.source_currency} -> {self.destination_currency}"
@@ -0,0 +1,99 @@
+import logging
+from typing import Dict, List
+
+from django.conf import settings
+
+from .cache import get_payload, get_rates, set_payload, set_rate
+from .compression import compress_variants
+from .corridors import CorridorIndex
+from .models import ExchangeRate
+from .quotes import RateQuote, encode_envelope, encode_quote_map
+from .timing import span
+
+logger = logging.getLogger(__name__)
+
+# Base currencies with no corridors
+EMPTY_ALL_RATES_BODY = encode_envelope(b'{}', status="success", message="Rates fetched")
+EMPTY_ALL_RATES_VARIANTS = compress_variants(EMPTY_ALL_RATES_BODY)
+
+
+def all_rates_body(base_currency: str, corridors: CorridorIndex) -> bytes:
+    """
+    Encoded AllRatesView body for a base currency.
+    Reads the cache first (one round trip), then the database for missing pairs (one query).
+    """
+    pairs = corridors.for_source(base_currency)
+    if not pairs:
+        return EMPTY_ALL_RATES_BODY
+
+    results = get_rates(pairs, corridors.cache_keys)
+
+    missing = [dest for source, dest in pairs if (source, dest) not in results]
+    if missing:
+        with span('db'):
+            rows = list(ExchangeRate.objects.filter(
+                source_currency=base_currency,
+                destination_currency__in=missing
+            ).values_list(*RateQuote.FIELDS))
+        for row in rows:
+            quote = RateQuote.from_row(row)
+            results[(quote.source_currency, quote.destination_currency)] = quote
+            # Cache in Redis
+            set_rate(quote.source_currency, quote.destination_currency, quote)
+
+    quotes = []
+    for pair in pairs:
+        quote = results.get(pair)
+        if quote is None:
+            # If not in DB, skip (will be fetched by background job)
+            logger.warning(f"Rate not found in DB: {pair[0]}->{pair[1]}")
+            continue
+        quotes.append(quote)
+
+    return encode_envelope(
+        encode_quote_map(quotes),
+        status="success",
+        message="Rates fetched",
+    )
+
+
+def snapshot_quotes(corridors: CorridorIndex) -> List[RateQuote]:
+    """Every stored rate for the registered corridors, in a single query."""
+    if not corridors:
+        return []
+    with span('db'):
+        rows = list(ExchangeRate.objects.filter(
+            source_currency__in=corridors.sources,
+            destination_currency__in=corridors.destinations
+        ).values_list(*RateQuote.FIELDS))
+    # The IN filters match the cross product; keep only real corridors
+    return [RateQuote.from_row(row) for row in rows if (row[0], row[1]) in corridors]
+
+
+def _payload_name(base_currency: str, corridors: CorridorIndex) -> str:
+    # Versioned so a corridor change never serves a body built from the old list
+    return f"all_rates:{corridors.version}:{base_currency}"
+
+
+def all_rates_variants(base_currency: str, corridors: CorridorIndex) -> Dict[str, bytes]:
+    """
+    AllRatesView body in every content-coding. Normally prebuilt by the
+    poller once per cycle; built (and cached) here only on a miss.
+    """
+    if base_currency not in corridors.by_source:
+        return EMPTY_ALL_RATES_VARIANTS
+    name = _payload_name(base_currency, corridors)
+    variants = get_payload(name)
+    if variants is None:
+        body = all_rates_body(base_currency, corridors)
+        with span('compress'):
+            variants = compress_variants(body)
+        set_payload(name, variants, settings.RATES_PAYLOAD_TTL)
+    return variants
+
+
+def refresh_all_rates_payloads(corridors: CorridorIndex, ttl_seconds: int) -> None:
+    """Rebuild and compress the AllRatesView bodies; called by the poller after each cycle."""
+    for base_currency in corridors.sources:
+        variants = compress_variants(all_rates_body(base_currency, corridors))
+        set_payload(_payload_name(base_currency, corridors), variants, ttl_seconds)
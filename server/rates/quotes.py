@@ -0,0 +1,130 @@
+from typing import Any, Dict, Iterable, Optional
+
+import orjson
+
+QUOTE_MESSAGE = "Transfer amount fetched"
+
+
+class RateQuote:
+    """
+    Immutable quote for one corridor.
+
+    Serializes to Flutterwave's transfer-rate response shape; the encoded JSON
+    is built once and reused by every view, the WebSocket consumer and the cache.
+    """
+
+    __slots__ = ('source_currency', 'destination_currency', 'rate', 'source_amount', 'destination_amount', '_encoded')
+
+    # Column order expected by from_row, e.g. ExchangeRate.objects.values_list(*RateQuote.FIELDS)
+    FIELDS = ('source_currency', 'destination_currency', 'rate', 'source_amount', 'destination_amount')
+
+    def __init__(self, source_currency: str, destination_currency: str, rate: float,
+                 source_amount: float, destination_amount: float, encoded: Optional[bytes] = None):
+        init = object.__setattr__
+        init(self, 'source_currency', source_currency)
+        init(self, 'destination_currency', destination_currency)
+        init(self, 'rate', rate)
+        init(self, 'source_amount', source_amount)
+        init(self, 'destination_amount', destination_amount)
+        init(self, '_encoded', encoded)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("RateQuote is immutable")
+
+    def __delattr__(self, name):
+        raise AttributeError("RateQuote is immutable")
+
+    def __reduce__(self):
+        return (RateQuote, (self.source_currency, self.destination_currency, self.rate,
+                            self.source_amount, self.destination_amount))
+
+    def __eq__(self, other):
+        if not isinstance(other, RateQuote):
+            return NotImplemented
+        return self._values() == other._values()
+
+    def __hash__(self):
+        return hash(self._values())
+
+    def __repr__(self):
+        return f"RateQuote({self.source_currency}->{self.destination_currency}: {self.rate})"
+
+    def _values(self):
+        return (self.source_currency, self.destination_currency, self.rate,
+                self.source_amount, self.destination_amount)
+
+    @property
+    def key(self) -> str:
+        return f"{self.source_currency}_{self.destination_currency}"
+
+    @classmethod
+    def from_row(cls, row) -> 'RateQuote':
+        """Build from a values_list row starting with FIELDS (Decimals are converted once here)."""
+        source_currency, destination_currency, rate, source_amount, destination_amount = row[:5]
+        return cls(source_currency, destination_currency, float(rate),
+                   float(source_amount), float(destination_amount))
+
+    @classmethod
+    def from_flutterwave(cls, resp: Dict[str, Any], source_currency: Optional[str] = None,
+                         destination_currency: Optional[str] = None) -> Optional['RateQuote']:
+        """Build from a Flutterwave transfers/rates body. Returns None unless it is a successful quote."""
+        if not isinstance(resp, dict) or resp.get('status') != 'success':
+            return None
+        data = resp.get('data') or {}
+        if not data.get('rate'):
+            return None
+        source = data.get('source') or {}
+        destination = data.get('destination') or {}
+        return cls(
+            (source.get('currency') or source_currency or '').upper(),
+            (destination.get('currency') or destination_currency or '').upper(),
+            float(data['rate']),
+            float(source.get('amount') or 0),
+            float(destination.get('amount') or 0),
+        )
+
+    @classmethod
+    def from_json(cls, raw: bytes) -> Optional['RateQuote']:
+        """Decode a previously encoded quote, keeping the bytes so they are never re-encoded."""
+        quote = cls.from_flutterwave(orjson.loads(raw))
+        if quote is not None:
+            object.__setattr__(quote, '_encoded', bytes(raw))
+        return quote
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "status": "success",
+            "message": QUOTE_MESSAGE,
+            "data": {
+                "rate": self.rate,
+                "source": {
+                    "currency": self.source_currency,
+                    "amount": self.source_amount
+                },
+                "destination": {
+                    "currency": self.destination_currency,
+                    "amount": self.destination_amount
+                }
+            }
+        }
+
+    def encode(self) -> bytes:
+        """JSON encoding of to_dict(), computed on first use and cached."""
+        encoded = self._encoded
+        if encoded is None:
+            encoded = orjson.dumps(self.to_dict())
+            object.__setattr__(self, '_encoded', encoded)
+        return encoded
+
+
+def encode_quote_map(quotes: Iterable[RateQuote]) -> bytes:
+    """Encode {"USD_NGN": quote, ...} by splicing each quote's cached encoding."""
+    return b'{' + b','.join(b'"%s":%s' % (quote.key.encode(), quote.encode()) for quote in quotes) + b'}'
+
+
+def encode_envelope(data: bytes, **fields) -> bytes:
+    """Encode {**fields, "data": data} around an already encoded data payload."""
+    head = orjson.dumps(fields)[:-1]
+    if fields:
+        head += b','
+    return head + b'"data":' + data + b'}'
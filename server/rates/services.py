@@ -1,10 +1,12 @@
 import os
 import time
 import requests
-from typing import Dict, Any
+from typing import Dict, Any, Optional
 from django.conf import settings
 from requests.adapters import HTTPAdapter
 from urllib3.util.retry import Retry
+from .quotes import RateQuote
+from .timing import timed
 
 
 def _create_session_with_retries() -> requests.Session:
@@ -22,6 +24,7 @@ def _create_session_with_retries() -> requests.Session:
     return session
 
 
+@timed('upstream')
 def fetch_flutterwave_rate(source_currency: str, destination_currency: str) -> Dict[str, Any]:
     """
     Call Flutterwave transfers/rates with amount=1 to get a per-unit quote.
@@ -48,39 +51,28 @@ def fetch_flutterwave_rate(source_currency: str, destination_currency: str) -> D
         session.close()
 
 
-def to_backend_shape(resp: Dict[str, Any]) -> Dict[str, Any]:
+def to_backend_shape(resp: Dict[str, Any], source_currency: Optional[str] = None,
+                     destination_currency: Optional[str] = None) -> Optional[RateQuote]:
     """
-    Ensure we return exactly Flutterwave's successful JSON shape.
+    Turn a Flutterwave response into a RateQuote, which serializes to
+    exactly Flutterwave's successful JSON shape. None if it isn't a quote.
     """
-    # If Flutterwave already returns the shape, pass-through.
-    return resp
+    return RateQuote.from_flutterwave(resp, source_currency, destination_currency)
 
 
-def save_rate_to_db(source_currency: str, destination_currency: str, fw_response: Dict[str, Any]) -> None:
+@timed('db')
+def save_rate_to_db(quote: RateQuote) -> None:
     """
-    Save exchange rate to database from Flutterwave response.
+    Save exchange rate to database from a quote.
     """
     from .models import ExchangeRate
-    
-    if fw_response.get('status') != 'success':
-        return
-    
-    data = fw_response.get('data', {})
-    rate_value = data.get('rate')
-    source_data = data.get('source', {})
-    dest_data = data.get('destination', {})
-    
-    if not rate_value:
-        return
-    
+
     ExchangeRate.objects.update_or_create(
-        source_currency=source_currency.upper(),
-        destination_currency=destination_currency.upper(),
+        source_currency=quote.source_currency,
+        destination_currency=quote.destination_currency,
         defaults={
-            'rate': rate_value,
-            'source_amount': source_data.get('amount', 0),
-            'destination_amount': dest_data.get('amount', 0),
+            'rate': quote.rate,
+            'source_amount': quote.source_amount,
+            'destination_amount': quote.destination_amount,
         }
     )
-
-
@@ -0,0 +1,189 @@
+import asyncio
+import logging
+import weakref
+from typing import AsyncIterator, Optional, Set
+
+from asgiref.sync import sync_to_async
+from channels.db import database_sync_to_async
+from channels.layers import get_channel_layer
+from django.conf import settings
+
+from .consumers import ALL_RATES_UPDATE_FRAME, encode_rate_update
+from .corridors import get_corridors
+from .events import events_since, latest_seq, seq_order
+from .payloads import snapshot_quotes
+from .quotes import encode_envelope, encode_quote_map
+from .throttling import StreamSlot
+
+logger = logging.getLogger(__name__)
+
+GROUP = 'rates_updates'
+# Re-join the group well before channels_redis expires the membership (default: 1 day)
+GROUP_REFRESH_SECONDS = 3600
+# Events buffered per connection before a slow client is dropped (it then resumes via Last-Event-ID)
+QUEUE_SIZE = 256
+RETRY_MS = 3000
+HEARTBEAT = b': keep-alive\n\n'
+
+_CLOSED = object()
+
+
+class Subscription:
+    __slots__ = ('queue', 'overflowed')
+
+    def __init__(self):
+        self.queue = asyncio.Queue(maxsize=QUEUE_SIZE)
+        self.overflowed = False
+
+    def push(self, message) -> None:
+        try:
+            self.queue.put_nowait(message)
+        except asyncio.QueueFull:
+            self.overflowed = True
+
+
+class RateEventHub:
+    """
+    A single channel-layer subscription to the rates_updates group per worker
+    (event loop), fanned out to every SSE connection it serves. It starts with
+    the first connection and stops after the last one closes.
+    """
+
+    def __init__(self):
+        self._subscribers: Set[Subscription] = set()
+        self._task: Optional[asyncio.Task] = None
+
+    def subscribe(self) -> Subscription:
+        subscription = Subscription()
+        self._subscribers.add(subscription)
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._run())
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        self._subscribers.discard(subscription)
+        if not self._subscribers and self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    async def _run(self):
+        layer = get_channel_layer()
+        loop = asyncio.get_running_loop()
+        channel = None
+        try:
+            # Inside the try so a failed first join also closes the streams
+            channel = await layer.new_channel()
+            await layer.group_add(GROUP, channel)
+            # Re-joined on a clock, not on idleness: the poller publishes far more often
+            # than GROUP_REFRESH_SECONDS, so the group would otherwise expire while busy
+            refresh_at = loop.time() + GROUP_REFRESH_SECONDS
+            while True:
+                try:
+                    message = await asyncio.wait_for(layer.receive(channel), max(refresh_at - loop.time(), 0))
+                except asyncio.TimeoutError:
+                    message = None
+                if loop.time() >= refresh_at:
+                    await layer.group_add(GROUP, channel)
+                    refresh_at = loop.time() + GROUP_REFRESH_SECONDS
+                if message is None:
+                    continue
+                for subscription in list(self._subscribers):
+                    subscription.push(message)
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            logger.exception("Rate event hub stopped")
+            # Close the streams; clients reconnect with Last-Event-ID and a new hub starts
+            for subscription in list(self._subscribers):
+                subscription.push(_CLOSED)
+        finally:
+            if channel is not None:
+                try:
+                    await layer.group_discard(GROUP, channel)
+                except Exception:
+                    pass
+
+
+_hubs: 'weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, RateEventHub]' = weakref.WeakKeyDictionary()
+
+
+def get_hub() -> RateEventHub:
+    loop = asyncio.get_running_loop()
+    hub = _hubs.get(loop)
+    if hub is None:
+        hub = _hubs[loop] = RateEventHub()
+    return hub
+
+
+def sse_event(event: str, data: str, event_id: Optional[str] = None) -> bytes:
+    lines = []
+    if event_id:
+        lines.append(f"id: {event_id}")
+    lines.append(f"event: {event}")
+    lines.append(f"data: {data}")
+    return ('\n'.join(lines) + '\n\n').encode()
+
+
+async def rate_event_stream(keys: Optional[Set[str]] = None,
+                            last_event_id: Optional[str] = None,
+                            slot: Optional[StreamSlot] = None) -> AsyncIterator[bytes]:
+    """
+    SSE body: the missed events after last_event_id (or a filtered all_rates
+    snapshot if they aged out), then live rate_update / all_rates_update
+    events with heartbeat comments in between. The client's stream slot, if
+    given, is renewed while the stream is open and released when it closes.
+    """
+    hub = get_hub()
+    # Subscribe before catching up so nothing published in between is lost
+    subscription = hub.subscribe()
+    try:
+        yield b'retry: %d\n\n' % RETRY_MS
+
+        last_sent = None
+        missed = await database_sync_to_async(events_since)(last_event_id) if last_event_id else None
+        if missed is None:
+            seq = await database_sync_to_async(latest_seq)()
+            quotes = await database_sync_to_async(lambda: snapshot_quotes(get_corridors()))()
+            if keys:
+                quotes = [quote for quote in quotes if quote.key in keys]
+            fields = {'type': 'all_rates'}
+            if seq:
+                fields['seq'] = seq
+                last_sent = seq_order(seq)
+            yield sse_event('all_rates', encode_envelope(encode_quote_map(quotes), **fields).decode(), seq)
+        else:
+            last_sent = seq_order(last_event_id)
+            for seq, key, rate in missed:
+                last_sent = seq_order(seq)
+                if not keys or key in keys:
+                    yield sse_event('rate_update', encode_rate_update(key, rate, seq), seq)
+
+        heartbeat = settings.RATES_SSE_HEARTBEAT_SECONDS
+        loop = asyncio.get_running_loop()
+        renew_at = loop.time() + heartbeat
+        while not subscription.overflowed:
+            if slot is not None and loop.time() >= renew_at:
+                await sync_to_async(slot.renew)()
+                renew_at = loop.time() + heartbeat
+            try:
+                message = await asyncio.wait_for(subscription.queue.get(), heartbeat)
+            except asyncio.TimeoutError:
+                yield HEARTBEAT
+                continue
+
+            if message is _CLOSED:
+                return
+            if message.get('type') == 'all_rates_update':
+                yield sse_event('all_rates_update', ALL_RATES_UPDATE_FRAME)
+            elif message.get('type') == 'rate_update':
+                seq = message.get('seq')
+                if seq and last_sent is not None and seq_order(seq) <= last_sent:
+                    # Already sent while catching up
+                    continue
+                if keys and message.get('key') not in keys:
+                    continue
+                yield sse_event('rate_update', message['frame'], seq)
+    finally:
+        hub.unsubscribe(subscription)
+        if slot is not None:
+            await sync_to_async(slot.release)()
@@ -0,0 +1,182 @@
+import hashlib
+import logging
+import math
+import os
+import time
+
+from django.conf import settings
+from django_redis import get_redis_connection
+from rest_framework.throttling import SimpleRateThrottle
+
+from .timing import span
+
+logger = logging.getLogger(__name__)
+
+
+def _digest(api_key: str) -> str:
+    return hashlib.sha256(api_key.encode()).hexdigest()
+
+
+# Only configured keys get their own budget; anything else counts against the IP,
+# so inventing a new key per request doesn't buy a fresh quota
+KNOWN_KEY_DIGESTS = frozenset(_digest(key) for key in getattr(settings, 'RATES_API_KEYS', ()))
+
+
+class SlidingWindowThrottle(SimpleRateThrottle):
+    """
+    Per-client sliding-window quota kept in a Redis sorted set and checked
+    with a single pipelined round trip. Clients are identified by their
+    X-API-Key header if it is one of RATES_API_KEYS, otherwise by their IP address.
+
+    Fails open: if Redis is unavailable the request is allowed.
+    """
+
+    cache_format = 'fxquota:%(scope)s:%(ident)s'
+
+    def get_client_ident(self, request) -> str:
+        api_key = request.headers.get('X-API-Key')
+        digest = _digest(api_key) if api_key else None
+        if digest in KNOWN_KEY_DIGESTS:
+            return 'key:' + digest[:32]
+        return 'ip:' + self.get_ident(request)
+
+    def get_cache_key(self, request, view):
+        return self.cache_format % {'scope': self.scope, 'ident': self.get_client_ident(request)}
+
+    def allow_request(self, request, view):
+        if self.rate is None:
+            return True
+
+        key = self.get_cache_key(request, view)
+        now = time.time()
+        member = f"{now:.6f}:{os.urandom(4).hex()}"
+        redis = get_redis_connection('default')
+        pipe = redis.pipeline()
+        pipe.zremrangebyscore(key, 0, now - self.duration)
+        pipe.zadd(key, {member: now})
+        pipe.zcard(key)
+        pipe.zrange(key, 0, 0, withscores=True)
+        pipe.expire(key, math.ceil(self.duration))
+        try:
+            with span('quota'):
+                _, _, count, oldest, _ = pipe.execute()
+        except Exception as e:
+            logger.warning("Rate limit check failed for %s: %s", self.scope, e)
+            return True
+
+        allowed = count <= self.num_requests
+        if not allowed:
+            # Rejected requests don't use up the window
+            count -= 1
+            try:
+                redis.zrem(key, member)
+            except Exception:
+                pass
+
+        oldest_at = oldest[0][1] if oldest else now
+        self.reset_seconds = max(0.0, oldest_at + self.duration - now)
+        self.remaining = max(0, self.num_requests - count)
+        _record_quota(request, self)
+        return allowed
+
+    def wait(self):
+        return math.ceil(self.reset_seconds)
+
+
+class RatesThrottle(SlidingWindowThrottle):
+    """Budget for every request to the rate endpoints (served from cache or the database)."""
+    scope = 'rates'
+
+
+class UpstreamRatesThrottle(SlidingWindowThrottle):
+    """Separate, smaller budget for requests that would trigger a Flutterwave fetch."""
+    scope = 'rates_upstream'
+
+
+class ExportRatesThrottle(SlidingWindowThrottle):
+    """Small budget for bulk exports, which read the whole table."""
+    scope = 'rates_export'
+
+
+class StreamSlot:
+    """
+    One of a client's RATES_SSE_MAX_STREAMS concurrent event streams, kept in a
+    Redis sorted set scored by each stream's last renewal. A stream whose worker
+    died without releasing its slot ages out after lease_seconds.
+
+    Fails open: if Redis is unavailable the stream is allowed.
+    """
+
+    key_format = 'fxstreams:%(ident)s'
+
+    def __init__(self, request, lease_seconds: float):
+        self.key = self.key_format % {'ident': RatesThrottle().get_client_ident(request)}
+        self.member = os.urandom(8).hex()
+        self.lease_seconds = lease_seconds
+        self.limit = settings.RATES_SSE_MAX_STREAMS
+
+    def acquire(self) -> bool:
+        if not self.limit:
+            return True
+        now = time.time()
+        redis = get_redis_connection('default')
+        pipe = redis.pipeline()
+        pipe.zremrangebyscore(self.key, 0, now - self.lease_seconds)
+        pipe.zadd(self.key, {self.member: now})
+        pipe.zcard(self.key)
+        pipe.expire(self.key, math.ceil(self.lease_seconds))
+        try:
+            _, _, count, _ = pipe.execute()
+            if count > self.limit:
+                redis.zrem(self.key, self.member)
+                return False
+        except Exception as e:
+            logger.warning("Stream limit check failed: %s", e)
+        return True
+
+    def renew(self) -> None:
+        if not self.limit:
+            return
+        try:
+            pipe = get_redis_connection('default').pipeline()
+            pipe.zadd(self.key, {self.member: time.time()})
+            pipe.expire(self.key, math.ceil(self.lease_seconds))
+            pipe.execute()
+        except Exception as e:
+            logger.warning("Failed to renew stream slot: %s", e)
+
+    def release(self) -> None:
+        if not self.limit:
+            return
+        try:
+            get_redis_connection('default').zrem(self.key, self.member)
+        except Exception as e:
+            logger.warning("Failed to release stream slot: %s", e)
+
+
+def _record_quota(request, throttle):
+    quotas = getattr(request, '_rate_quotas', None)
+    if quotas is None:
+        quotas = request._rate_quotas = []
+    quotas.append(throttle)
+
+
+class RateLimitHeadersMixin:
+    """Adds RateLimit-* headers describing the tightest quota checked for the request."""
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        return add_rate_limit_headers(request, response)
+
+
+def add_rate_limit_headers(request, response):
+    """RateLimit-* headers for the tightest quota checked for the request (plain Django views)."""
+    quotas = getattr(request, '_rate_quotas', None)
+    if quotas:
+        tightest = min(quotas, key=lambda throttle: throttle.remaining)
+        response['RateLimit-Policy'] = f"{tightest.num_requests};w={tightest.duration}"
+        response['RateLimit-Limit'] = str(tightest.num_requests)
+        response['RateLimit-Remaining'] = str(tightest.remaining)
+        response['RateLimit-Reset'] = str(math.ceil(tightest.reset_seconds))
+    return response
+
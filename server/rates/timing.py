@@ -0,0 +1,127 @@
+import contextvars
+import functools
+import logging
+import time
+
+import orjson
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+_current = contextvars.ContextVar('rates_request_timer', default=None)
+
+
+class RequestTimer:
+    """Accumulated time per span name (e.g. cache, db, upstream) for one request."""
+
+    __slots__ = ('started', 'spans')
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.spans = {}
+
+    def add(self, name: str, seconds: float) -> None:
+        entry = self.spans.get(name)
+        if entry is None:
+            self.spans[name] = [seconds, 1]
+        else:
+            entry[0] += seconds
+            entry[1] += 1
+
+    def total_ms(self) -> float:
+        return (time.perf_counter() - self.started) * 1000
+
+    def header(self, total_ms: float) -> str:
+        parts = [f"{name};dur={seconds * 1000:.2f}" for name, (seconds, _) in self.spans.items()]
+        parts.append(f"total;dur={total_ms:.2f}")
+        return ', '.join(parts)
+
+
+class span:
+    """
+    Time a block into the current request's timer. Outside a request
+    (e.g. in poll_rates) there is no timer and this does nothing.
+    """
+
+    __slots__ = ('name', 'timer', 'started')
+
+    def __init__(self, name: str):
+        self.name = name
+
+    def __enter__(self):
+        self.timer = _current.get()
+        if self.timer is not None:
+            self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        if self.timer is not None:
+            self.timer.add(self.name, time.perf_counter() - self.started)
+        return False
+
+
+def timed(name: str):
+    """Decorator form of span."""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+class ServerTimingMiddleware:
+    """
+    Reports the per-request span breakdown in a Server-Timing header and logs
+    a structured line for requests slower than RATES_SLOW_REQUEST_MS.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+        self.slow_ms = settings.RATES_SLOW_REQUEST_MS
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        timer = RequestTimer()
+        token = _current.set(timer)
+        try:
+            response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self.finish(request, response, timer)
+
+    async def __acall__(self, request):
+        timer = RequestTimer()
+        token = _current.set(timer)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self.finish(request, response, timer)
+
+    def finish(self, request, response, timer: RequestTimer):
+        total_ms = timer.total_ms()
+        response['Server-Timing'] = timer.header(total_ms)
+        if self.slow_ms and total_ms >= self.slow_ms:
+            logger.warning(orjson.dumps({
+                'event': 'slow_request',
+                'method': request.method,
+                'path': request.path,
+                'query': request.META.get('QUERY_STRING', ''),
+                'status': response.status_code,
+                'total_ms': round(total_ms, 2),
+                'spans': {
+                    name: {'ms': round(seconds * 1000, 2), 'count': count}
+                    for name, (seconds, count) in timer.spans.items()
+                },
+            }).decode())
+        return response
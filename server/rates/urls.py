@@ -1,10 +1,12 @@
 from django.urls import path
-from .views import RatesView, AllRatesView, RateChangeCheckView
+from .views import RatesView, AllRatesView, RateChangeCheckView, RateEventStreamView, RatesExportView
 
 urlpatterns = [
     path('rates/', RatesView.as_view(), name='rates'),
     path('rates/all/', AllRatesView.as_view(), name='all-rates'),
     path('rates/check-changes/', RateChangeCheckView.as_view(), name='rate-change-check'),
+    path('rates/stream/', RateEventStreamView.as_view(), name='rate-stream'),
+    path('rates/export/', RatesExportView.as_view(), name='rates-export'),
 ]
 
 
@@ -1,18 +1,49 @@
 import logging
+import math
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
 from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
+from django.views import View
+from asgiref.sync import sync_to_async
 from django.utils import timezone
 from datetime import timedelta
 from .cache import get_rate, set_rate
+from .compression import variant_response
 from .services import fetch_flutterwave_rate, to_backend_shape, save_rate_to_db
 from .models import ExchangeRate
+from .corridors import get_corridors
+from .payloads import all_rates_variants
+from .quotes import RateQuote
+from .sse import rate_event_stream
+from .export import CONTENT_TYPES, FORMATS, aiter_chunks, encode_rows, export_rows, parse_timestamp
+from .throttling import (
+    ExportRatesThrottle, RateLimitHeadersMixin, RatesThrottle, StreamSlot, UpstreamRatesThrottle,
+    add_rate_limit_headers,
+)
+from .timing import span
 
 logger = logging.getLogger(__name__)
 
 
-class RatesView(APIView):
+def _json_response(body: bytes, status_code: int = status.HTTP_200_OK) -> HttpResponse:
+    """Serve an already encoded JSON body without going through a renderer."""
+    return HttpResponse(body, status=status_code, content_type='application/json')
+
+
+def _too_many_requests(request, message: str, retry_after: int) -> JsonResponse:
+    """429 for the plain (non-DRF) views, with the same RateLimit-* headers as the others."""
+    response = JsonResponse(
+        {"status": "error", "message": message, "data": None},
+        status=status.HTTP_429_TOO_MANY_REQUESTS,
+    )
+    response['Retry-After'] = str(retry_after)
+    return add_rate_limit_headers(request, response)
+
+
+class RatesView(RateLimitHeadersMixin, APIView):
     """
     GET /api/rates/?source_currency=NGN&destination_currency=CAD&amount=1
     Returns the same JSON shape as Flutterwave.
@@ -33,24 +64,26 @@ class RatesView(APIView):
         # First check Redis cache
         cached = get_rate(source_currency, destination_currency)
         if cached:
-            return Response(cached, status=status.HTTP_200_OK)
+            return _json_response(cached.encode())
 
         # Then check database (rates are pre-fetched and stored)
         try:
-            db_rate = ExchangeRate.objects.get(
-                source_currency=source_currency,
-                destination_currency=destination_currency
-            )
+            with span('db'):
+                row = ExchangeRate.objects.values_list(*RateQuote.FIELDS, 'last_updated').get(
+                    source_currency=source_currency,
+                    destination_currency=destination_currency
+                )
             # Ensure data is fresh; if stale, fetch a new quote from Flutterwave
-            is_stale = timezone.now() - db_rate.last_updated > timedelta(minutes=10)
-            if is_stale:
+            is_stale = timezone.now() - row[-1] > timedelta(seconds=settings.RATES_FRESH_SECONDS)
+            # Past its upstream budget, the client gets the stored value instead of a fresh quote
+            if is_stale and UpstreamRatesThrottle().allow_request(request, self):
                 try:
                     fw_resp = fetch_flutterwave_rate(source_currency, destination_currency)
-                    if fw_resp.get('status') == 'success':
-                        save_rate_to_db(source_currency, destination_currency, fw_resp)
-                        shaped = to_backend_shape(fw_resp)
-                        set_rate(source_currency, destination_currency, shaped)
-                        return Response(shaped, status=status.HTTP_200_OK)
+                    quote = to_backend_shape(fw_resp, source_currency, destination_currency)
+                    if quote:
+                        save_rate_to_db(quote)
+                        set_rate(source_currency, destination_currency, quote)
+                        return _json_response(quote.encode())
                 except Exception as e:
                     logger.warning(
                         "Failed to refresh stale rate %s->%s: %s. Falling back to cached DB value.",
@@ -58,35 +91,27 @@ class RatesView(APIView):
                         destination_currency,
                         e,
                     )
-            # Convert DB model to Flutterwave response shape
-            shaped = {
-                "status": "success",
-                "message": "Transfer amount fetched",
-                "data": {
-                    "rate": float(db_rate.rate),
-                    "source": {
-                        "currency": db_rate.source_currency,
-                        "amount": float(db_rate.source_amount)
-                    },
-                    "destination": {
-                        "currency": db_rate.destination_currency,
-                        "amount": float(db_rate.destination_amount)
-                    }
-                }
-            }
+            quote = RateQuote.from_row(row)
             # Cache in Redis for faster access
-            set_rate(source_currency, destination_currency, shaped)
-            return Response(shaped, status=status.HTTP_200_OK)
+            set_rate(source_currency, destination_currency, quote)
+            return _json_response(quote.encode())
         except ExchangeRate.DoesNotExist:
+            upstream_throttle = UpstreamRatesThrottle()
+            if not upstream_throttle.allow_request(request, self):
+                return Response(
+                    {"status": "error", "message": "Upstream request quota exceeded, try again later", "data": None},
+                    status=status.HTTP_429_TOO_MANY_REQUESTS,
+                    headers={'Retry-After': str(upstream_throttle.wait())},
+                )
             # If not in DB, fetch from Flutterwave as fallback
             try:
                 fw_resp = fetch_flutterwave_rate(source_currency, destination_currency)
-                if fw_resp.get('status') == 'success':
+                quote = to_backend_shape(fw_resp, source_currency, destination_currency)
+                if quote:
                     # Save to database for future use
-                    save_rate_to_db(source_currency, destination_currency, fw_resp)
-                    shaped = to_backend_shape(fw_resp)
-                    set_rate(source_currency, destination_currency, shaped)
-                    return Response(shaped, status=status.HTTP_200_OK)
+                    save_rate_to_db(quote)
+                    set_rate(source_currency, destination_currency, quote)
+                    return _json_response(quote.encode())
             except Exception as e:
                 logger.exception(f"Failed to fetch Flutterwave rate: {e}")
                 return Response(
@@ -100,84 +125,22 @@ class RatesView(APIView):
         )
 
 
-class AllRatesView(APIView):
+class AllRatesView(RateLimitHeadersMixin, APIView):
     """
     GET /api/rates/all/?base_currency=NGN
-    Returns all popular currency pairs for a base currency.
-    Fetches from cache first, then Flutterwave for missing pairs.
+    Returns every registered corridor for a base currency,
+    gzip/brotli compressed when the client accepts it.
     """
 
-    # Destination currencies (African countries)
-    DESTINATION_CURRENCIES = [
-        'XOF',  # Benin, Burkina Faso, Guinea Bissau, Mali, Senegal, Togo
-        'XAF',  # Cameroon, CAR, Chad, Equatorial Guinea, Gabon, Rep. Congo
-        'EGP',  # Egypt
-        'ETB',  # Ethiopia
-        'GHS',  # Ghana
-        'KES',  # Kenya
-        'MAD',  # Morocco
-        'NGN',  # Nigeria
-        'ZAR',  # South Africa
-        'UGX',  # Uganda
-        'ZMW',  # Zambia
-    ]
-
-    # Source currencies
-    SOURCE_CURRENCIES = ['USD', 'CAD', 'GBP', 'EUR']
-
     def get(self, request):
         base_currency = request.query_params.get('base_currency', 'USD').upper()
-        
-        results = {}
-
-        # Fetch all rates from database (pre-fetched and stored)
-        for dest_currency in self.DESTINATION_CURRENCIES:
-            if dest_currency == base_currency:
-                continue
-            
-            # Check Redis cache first
-            cached = get_rate(base_currency, dest_currency)
-            if cached:
-                results[f"{base_currency}_{dest_currency}"] = cached
-                continue
-
-            # Then check database
-            try:
-                db_rate = ExchangeRate.objects.get(
-                    source_currency=base_currency,
-                    destination_currency=dest_currency
-                )
-                # Convert to Flutterwave response shape
-                shaped = {
-                    "status": "success",
-                    "message": "Transfer amount fetched",
-                    "data": {
-                        "rate": float(db_rate.rate),
-                        "source": {
-                            "currency": db_rate.source_currency,
-                            "amount": float(db_rate.source_amount)
-                        },
-                        "destination": {
-                            "currency": db_rate.destination_currency,
-                            "amount": float(db_rate.destination_amount)
-                        }
-                    }
-                }
-                results[f"{base_currency}_{dest_currency}"] = shaped
-                # Cache in Redis
-                set_rate(base_currency, dest_currency, shaped)
-            except ExchangeRate.DoesNotExist:
-                # If not in DB, skip (will be fetched by background job)
-                logger.warning(f"Rate not found in DB: {base_currency}->{dest_currency}")
 
-        return Response({
-            "status": "success",
-            "message": "Rates fetched",
-            "data": results
-        }, status=status.HTTP_200_OK)
+        # Prebuilt and precompressed once per poll cycle; only built here on a miss
+        variants = all_rates_variants(base_currency, get_corridors())
+        return variant_response(variants, request)
 
 
-class RateChangeCheckView(APIView):
+class RateChangeCheckView(RateLimitHeadersMixin, APIView):
     """
     GET /api/rates/check-changes/
     Checks if exchange rates have been updated in the last 5 days.
@@ -226,3 +189,82 @@ class RateChangeCheckView(APIView):
         }, status=status.HTTP_200_OK)
 
 
+class RateEventStreamView(View):
+    """
+    GET /api/rates/stream/?pairs=USD_NGN,GBP_KES
+    Server-Sent Events stream of the rate_update and all_rates_update events
+    pushed to WebSocket clients, for clients that can't keep a WebSocket open.
+    Resumes from the Last-Event-ID header (or ?last_event_id=) after a reconnect.
+    Needs an ASGI server.
+    """
+
+    async def get(self, request):
+        # Not a DRF view: each connect counts against the general quota, and a client
+        # may only hold RATES_SSE_MAX_STREAMS streams open at once
+        throttle = RatesThrottle()
+        if not await sync_to_async(throttle.allow_request)(request, self):
+            return _too_many_requests(request, "Request quota exceeded, try again later", throttle.wait())
+        lease_seconds = settings.RATES_SSE_HEARTBEAT_SECONDS * 3
+        slot = StreamSlot(request, lease_seconds)
+        if not await sync_to_async(slot.acquire)():
+            return _too_many_requests(request, "Too many open streams", math.ceil(lease_seconds))
+
+        pairs = request.GET.get('pairs', '')
+        keys = {pair.strip().upper() for pair in pairs.split(',') if pair.strip()} or None
+        last_event_id = request.headers.get('Last-Event-ID') or request.GET.get('last_event_id')
+
+        response = StreamingHttpResponse(
+            rate_event_stream(keys, last_event_id, slot),
+            content_type='text/event-stream',
+        )
+        response['Cache-Control'] = 'no-cache'
+        # Stop nginx from buffering the stream
+        response['X-Accel-Buffering'] = 'no'
+        return add_rate_limit_headers(request, response)
+
+
+class RatesExportView(View):
+    """
+    GET /api/rates/export/?format=ndjson|csv&source_currency=USD&destination_currency=NGN
+                          &pair=USD_NGN,GBP_KES&since=2024-01-01&until=2024-02-01T12:00:00Z
+    Streams every matching stored rate as NDJSON (default) or CSV.
+    Rows are read with a server-side cursor and written as they arrive.
+    """
+
+    def get(self, request):
+        # Not a DRF view, so the quotas are checked here: the general budget and the export one
+        for throttle in (RatesThrottle(), ExportRatesThrottle()):
+            if not throttle.allow_request(request, self):
+                return _too_many_requests(request, "Export quota exceeded, try again later", throttle.wait())
+
+        export_format = request.GET.get('format', 'ndjson').lower()
+        if export_format not in FORMATS:
+            return JsonResponse(
+                {"status": "error", "message": f"format must be one of: {', '.join(FORMATS)}", "data": None},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        try:
+            since = parse_timestamp(request.GET['since']) if request.GET.get('since') else None
+            until = parse_timestamp(request.GET['until']) if request.GET.get('until') else None
+        except ValueError as e:
+            return JsonResponse(
+                {"status": "error", "message": str(e), "data": None},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        pairs = [pair.strip() for pair in request.GET.get('pair', '').split(',') if pair.strip()]
+
+        chunks = encode_rows(export_rows(
+            source_currency=request.GET.get('source_currency'),
+            destination_currency=request.GET.get('destination_currency'),
+            pairs=pairs,
+            since=since,
+            until=until,
+        ), export_format)
+        # Under ASGI, hand Django an async iterator so it doesn't buffer the whole export
+        if isinstance(request, ASGIRequest):
+            chunks = aiter_chunks(chunks)
+
+        response = StreamingHttpResponse(chunks, content_type=CONTENT_TYPES[export_format])
+        filename = f"rates-{timezone.now():%Y%m%d-%H%M%S}.{export_format}"
+        response['Content-Disposition'] = f'attachment; filename="{filename}"'
+        return add_rate_limit_headers(request, response)
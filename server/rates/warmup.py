@@ -0,0 +1,110 @@
+import logging
+import mmap
+import os
+import time
+from datetime import timedelta
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+import orjson
+from django.conf import settings
+from django.utils import timezone
+
+from .cache import prime_fallback, set_rates
+from .models import ExchangeRate
+from .quotes import RateQuote, encode_quote_map
+
+logger = logging.getLogger(__name__)
+
+
+def snapshot_path() -> Path:
+    return Path(settings.RATES_SNAPSHOT_PATH)
+
+
+def load_fresh_quotes() -> List[Tuple[RateQuote, float]]:
+    """
+    Stored rates still inside the RATES_FRESH_SECONDS window, in a single query,
+    with how many seconds each stays fresh. Older rows are left for RatesView
+    to refresh from upstream.
+    """
+    now = timezone.now()
+    fresh_for = timedelta(seconds=settings.RATES_FRESH_SECONDS)
+    rows = ExchangeRate.objects.filter(last_updated__gt=now - fresh_for).values_list(
+        *RateQuote.FIELDS, 'last_updated'
+    )
+    return [(RateQuote.from_row(row), (row[-1] + fresh_for - now).total_seconds()) for row in rows]
+
+
+def warm_cache(ttl_seconds: int = 1200, entries: Optional[List[Tuple[RateQuote, float]]] = None) -> int:
+    """
+    Bulk-load the fresh stored rates into Redis (one pipeline) and the process
+    cache. Each expires when it goes stale, or after ttl_seconds if sooner.
+    """
+    if entries is None:
+        entries = load_fresh_quotes()
+    set_rates((quote, min(ttl_seconds, fresh_for)) for quote, fresh_for in entries)
+    return len(entries)
+
+
+def write_snapshot(entries: Optional[List[Tuple[RateQuote, float]]] = None, path: Optional[Path] = None) -> Path:
+    """
+    Write the fresh rates, and when each goes stale, to the snapshot file.
+    The file is replaced atomically, so readers never see a partial write.
+    """
+    if entries is None:
+        entries = load_fresh_quotes()
+    path = path or snapshot_path()
+    now = time.time()
+    fresh_until = {quote.key: now + fresh_for for quote, fresh_for in entries}
+    body = b'{"generated_at":%s,"fresh_until":%s,"rates":%s}' % (
+        orjson.dumps(now), orjson.dumps(fresh_until), encode_quote_map(quote for quote, _ in entries)
+    )
+    tmp = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    with open(tmp, 'wb') as f:
+        f.write(body)
+    os.replace(tmp, path)
+    return path
+
+
+def read_snapshot(path: Optional[Path] = None) -> Tuple[float, List[Tuple[RateQuote, float]]]:
+    """
+    Read the snapshot file through mmap.
+    Returns (generated_at, [(quote, fresh_until), ...]), timestamps in epoch seconds.
+    """
+    path = path or snapshot_path()
+    with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+        with memoryview(mapped) as view:
+            body = orjson.loads(view)
+    fresh_until = body.get('fresh_until', {})
+    entries = []
+    for key, payload in body.get('rates', {}).items():
+        quote = RateQuote.from_flutterwave(payload)
+        if quote is not None:
+            # Files written before fresh_until existed count as already stale
+            entries.append((quote, float(fresh_until.get(key, 0))))
+    return float(body.get('generated_at', 0)), entries
+
+
+def load_snapshot(max_age_seconds: Optional[float] = None) -> int:
+    """
+    Seed the fallback cache from the snapshot file, so a worker can still serve
+    rates on a Redis miss or outage without a database round trip. Each entry
+    expires when its rate goes stale, or when the snapshot is max_age_seconds
+    old if that comes first. Returns how many were loaded.
+    """
+    if max_age_seconds is None:
+        max_age_seconds = settings.RATES_SNAPSHOT_MAX_AGE
+    try:
+        generated_at, entries = read_snapshot()
+    except FileNotFoundError:
+        return 0
+    except (OSError, ValueError) as e:
+        logger.warning("Ignoring unreadable rates snapshot: %s", e)
+        return 0
+
+    now = time.time()
+    expires_at = generated_at + max_age_seconds
+    live = [(quote, min(expires_at, fresh_until) - now) for quote, fresh_until in entries]
+    live = [(quote, ttl_seconds) for quote, ttl_seconds in live if ttl_seconds > 0]
+    prime_fallback(live)
+    return len(live)
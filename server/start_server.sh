@@ -2,5 +2,5 @@
 cd "$(dirname "$0")"
 source .venv/bin/activate
 echo "Starting Django server with WebSocket support on port 8000..."
-daphne -b 0.0.0.0 -p 8000 backend.asgi:application
-
+# uvicorn's websockets implementation negotiates permessage-deflate with clients that offer it
+uvicorn backend.asgi:application --host 0.0.0.0 --port 8000 --ws websockets --ws-per-message-deflate true